@@ -2,76 +2,387 @@
 from __future__ import annotations
 
 import argparse
-import csv
+import email.utils
+import gzip
+import http.client
 import json
 import os
-import subprocess
-import tempfile
+import queue
+import threading
 import time
 import urllib.parse
-import urllib.request
 from collections import Counter
-from dataclasses import dataclass
-from datetime import datetime, timezone
+from collections.abc import Callable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import closing
+from datetime import date, datetime, timezone
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import psycopg
+
+try:
+    # Optional C parser for the large /accounts/* responses; the workflow installs it.
+    from orjson import dumps as dumps_json, loads as loads_json
+except ImportError:
+    loads_json = json.loads
+
+    def dumps_json(obj: object) -> bytes:
+        return json.dumps(obj, separators=(",", ":")).encode("utf-8")
 
 ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
-X_LEVELS = {4, 5, 6, 7}
+X_LEVEL_MASK = 0b11110000  # bit n set <=> level n is an X node (levels 4, 5, 6, 7)
+
+# 4-byte function selectors (first 4 bytes of keccak256 of the canonical signature).
+SELECTOR_TOTAL_SUPPLY = "0x18160ddd"  # totalSupply()
+SELECTOR_GET_METADATA = "0xa574cea4"  # getMetadata(uint256)
+SELECTOR_TOKEN_BY_INDEX = "0x4f6ccce7"  # tokenByIndex(uint256)
+SELECTOR_OWNER_OF = "0x6352211e"  # ownerOf(uint256)
+SELECTOR_GET_TOKEN = "0xe4b50cb8"  # getToken(uint256)
+
+
+_LOG_LOCK = threading.Lock()
+
+
+def log(message: str) -> None:
+    # Both scans log from their own threads; keep each line intact.
+    with _LOG_LOCK:
+        print(message, flush=True)
+
+
+class RowBuffer:
+    """A batch of holder rows from one contract scan, stored column-wise.
+
+    Values shared by every row of a scan (source, contract, snapshot date, sync time)
+    are kept once instead of being repeated on a per-row object. ``span`` is the
+    token id (legacy) or index (stargate) range the batch covers; ``complete`` is
+    cleared when any position in it failed, so the checkpoint never moves past it.
+    """
 
+    def __init__(self, source: str, contract_address: str, capacity: int = 0, *, span: range = range(0)) -> None:
+        self.source = source
+        self.contract_address = contract_address
+        self.span = span
+        self.complete = True
+        # Columns are pre-sized to the batch width and trimmed once filled, so
+        # appends never trigger list re-allocation.
+        self.token_ids: list[int] = [0] * capacity
+        self.owners: list[str] = [""] * capacity
+        self.levels: list[int] = [0] * capacity
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, token_id: int, owner: str, level: int) -> None:
+        i = self._size
+        if i < len(self.token_ids):
+            self.token_ids[i] = token_id
+            self.owners[i] = owner
+            self.levels[i] = level
+        else:
+            self.token_ids.append(token_id)
+            self.owners.append(owner)
+            self.levels.append(level)
+        self._size = i + 1
+
+    def trim(self) -> None:
+        del self.token_ids[self._size :]
+        del self.owners[self._size :]
+        del self.levels[self._size :]
+
+
+class HttpStatusError(RuntimeError):
+    def __init__(self, status: int, reason: str) -> None:
+        super().__init__(f"HTTP {status} {reason}")
+        self.status = status
+
+
+def retry_after_seconds(headers: http.client.HTTPMessage) -> float:
+    """Return how long the upstream asked us to back off, from ``retry-after`` or rate-limit headers."""
+    value = headers.get("retry-after")
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            try:
+                return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+            except (TypeError, ValueError):
+                return 0.0
+
+    if headers.get("x-ratelimit-remaining", "").strip() == "0":
+        try:
+            reset = float(headers.get("x-ratelimit-reset", "0"))
+        except ValueError:
+            return 0.0
+        # Some gateways send an epoch timestamp, others a delta in seconds.
+        return max(0.0, reset - time.time()) if reset > 1_000_000_000 else reset
+    return 0.0
 
-@dataclass
-class SnapshotRow:
-    snapshot_date: str
-    token_id: int
-    owner_address: str
-    node_level: int
-    is_x: bool
-    source: str
-    contract_address: str
-    synced_at: str
 
+class AimdController:
+    """Adaptive in-flight request limit (additive increase, multiplicative decrease).
+
+    Every ``window`` responses the mean latency is compared with ``target_latency``:
+    at or under target the limit grows by ``increase``, over target it halves.
+    Throttling signals (429/5xx, connection resets) halve it immediately.
+    """
+
+    def __init__(
+        self,
+        *,
+        start: float = 8,
+        minimum: float = 1,
+        maximum: float = 64,
+        window: int = 20,
+        target_latency: float = 0.5,
+        increase: float = 0.5,
+    ) -> None:
+        self.minimum = minimum
+        self.maximum = maximum
+        self.window = window
+        self.target_latency = target_latency
+        self.increase = increase
+        self.limit = max(minimum, min(maximum, start))
+        self._in_flight = 0
+        self._latencies: list[float] = []
+        self._cond = threading.Condition()
+
+    def acquire(self) -> None:
+        with self._cond:
+            while self._in_flight >= int(self.limit):
+                self._cond.wait()
+            self._in_flight += 1
+
+    def release(self, latency: float, *, overloaded: bool) -> None:
+        with self._cond:
+            self._in_flight -= 1
+            if overloaded:
+                self._decrease()
+            else:
+                self._latencies.append(latency)
+                if len(self._latencies) >= self.window:
+                    mean = sum(self._latencies) / len(self._latencies)
+                    self._latencies.clear()
+                    if mean <= self.target_latency:
+                        self.limit = min(self.maximum, self.limit + self.increase)
+                    else:
+                        self._decrease()
+            self._cond.notify_all()
+
+    def _decrease(self) -> None:
+        self.limit = max(self.minimum, self.limit * 0.5)
+        self._latencies.clear()
+
+
+OVERLOAD_STATUSES = {429, 502, 503, 504}
+
+
+class HttpPool:
+    """Keep-alive connections to a single upstream host, reused across requests.
+
+    Every scan talks to the same host, so paying the TCP+TLS handshake once per
+    connection (instead of once per request, as ``urlopen`` does) removes most of
+    the per-call latency. Responses are requested gzip-compressed, and in-flight
+    requests are bounded by an ``AimdController``.
+    """
+
+    def __init__(
+        self, base_url: str, controller: AimdController, *, maxsize: int = 32, timeout: float = 30.0
+    ) -> None:
+        parts = urllib.parse.urlsplit(base_url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError(f"unsupported base url: {base_url}")
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port
+        self.controller = controller
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self._idle: list[http.client.HTTPConnection] = []
+        self._lock = threading.Lock()
+
+    def _connect(self) -> http.client.HTTPConnection:
+        conn_cls = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+        return conn_cls(self.host, self.port, timeout=self.timeout)
+
+    def _acquire(self) -> tuple[http.client.HTTPConnection, bool]:
+        with self._lock:
+            if self._idle:
+                return self._idle.pop(), True
+        return self._connect(), False
+
+    def _release(self, conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            if len(self._idle) < self.maxsize:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def _send(
+        self, method: str, path: str, body: bytes | None, headers: dict[str, str]
+    ) -> tuple[http.client.HTTPResponse, bytes]:
+        while True:
+            conn, reused = self._acquire()
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                resp = conn.getresponse()
+                data = resp.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                conn.close()
+                if reused:
+                    # The server dropped an idle keep-alive socket; retry once on a fresh one.
+                    continue
+                raise
+            except Exception:
+                conn.close()
+                raise
+            break
+
+        if resp.will_close:
+            conn.close()
+        else:
+            self._release(conn)
+        return resp, data
+
+    def request(self, method: str, url: str, *, body: bytes | None = None, headers: dict[str, str] | None = None) -> bytes:
+        parts = urllib.parse.urlsplit(url)
+        if parts.hostname != self.host:
+            raise ValueError(f"url host does not match pool host {self.host}: {url}")
+        path = parts.path or "/"
+        if parts.query:
+            path = f"{path}?{parts.query}"
+        send_headers = {"accept": "application/json", "accept-encoding": "gzip", **(headers or {})}
+
+        self.controller.acquire()
+        started = time.monotonic()
+        overloaded = False
+        try:
+            try:
+                resp, data = self._send(method, path, body, send_headers)
+            except (ConnectionResetError, http.client.RemoteDisconnected, TimeoutError):
+                overloaded = True
+                raise
+
+            # Honour upstream back-off hints while still holding the slot, so other
+            # workers are throttled too.
+            wait = retry_after_seconds(resp.headers)
+            if resp.status >= 400:
+                overloaded = resp.status in OVERLOAD_STATUSES
+                if wait > 0:
+                    time.sleep(wait)
+                raise HttpStatusError(resp.status, resp.reason)
+            if wait > 0:
+                time.sleep(wait)
+            if resp.headers.get("content-encoding", "").strip().lower() == "gzip":
+                return gzip.decompress(data)
+            return data
+        finally:
+            self.controller.release(time.monotonic() - started, overloaded=overloaded)
 
-def build_call_url(api_base: str, contract_address: str, signature: str) -> str:
-    encoded = urllib.parse.quote(signature, safe="")
-    return f"{api_base.rstrip('/')}/{contract_address.lower()}/{encoded}"
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
 
 
-def fetch_json(url: str, max_retries: int, backoff_sec: float) -> object:
+def fetch_json(
+    pool: HttpPool, url: str, max_retries: int, backoff_sec: float, *, body: object | None = None
+) -> object:
+    method = "GET"
+    data: bytes | None = None
+    headers: dict[str, str] = {}
+    if body is not None:
+        method = "POST"
+        data = dumps_json(body)
+        headers["content-type"] = "application/json"
+
     last_error: str | None = None
     for attempt in range(max_retries):
         try:
-            req = urllib.request.Request(url, headers={"accept": "application/json"})
-            with urllib.request.urlopen(req, timeout=30) as resp:
-                body = resp.read().decode("utf-8")
-            return json.loads(body)
+            resp_body = pool.request(method, url, body=data, headers=headers)
+            return loads_json(resp_body)
         except Exception as exc:  # noqa: BLE001
             last_error = str(exc)
             time.sleep(backoff_sec * (2**attempt))
     raise RuntimeError(f"request failed after retries: {url} :: {last_error}")
 
 
-def fetch_uint(api_base: str, contract_address: str, signature: str, *, max_retries: int, backoff_sec: float) -> int:
-    payload = fetch_json(build_call_url(api_base, contract_address, signature), max_retries=max_retries, backoff_sec=backoff_sec)
-    if isinstance(payload, str):
-        return int(payload)
-    raise RuntimeError(f"unexpected uint payload for {signature}: {payload!r}")
+def abi_word_hex(data: str, index: int) -> str:
+    """Return the ``index``-th 32-byte word of ``0x``-prefixed ABI return data as hex."""
+    start = 2 + 64 * index
+    word = data[start : start + 64]
+    if len(word) != 64:
+        raise RuntimeError(f"unexpected ABI return data: {data!r}")
+    return word
+
+
+def abi_uint(data: str, index: int) -> int:
+    return int(abi_word_hex(data, index), 16)
+
+
+def abi_address(data: str, index: int) -> str:
+    # An address is the low 20 bytes of its word, so it is sliced out as hex directly.
+    return "0x" + abi_word_hex(data, index)[24:].lower()
+
+
+def inspect_clauses(
+    pool: HttpPool,
+    thor_url: str,
+    clauses: list[dict],
+    *,
+    revision: str,
+    max_retries: int,
+    backoff_sec: float,
+) -> list[dict]:
+    """Simulate ``clauses`` at block ``revision`` in one ``POST /accounts/*`` call and return one output per clause.
+
+    Thor stops executing at the first reverted clause, so any clauses after it are
+    re-sent in a follow-up request.
+    """
+    url = f"{thor_url.rstrip('/')}/accounts/*?revision={revision}"
+    outputs: list[dict] = []
+    pending = clauses
+    while pending:
+        payload = fetch_json(pool, url, max_retries, backoff_sec, body={"clauses": pending})
+        if not isinstance(payload, list) or not payload or len(payload) > len(pending):
+            raise RuntimeError(f"unexpected /accounts/* payload: {payload!r}")
+        if len(payload) < len(pending) and not payload[-1].get("reverted"):
+            raise RuntimeError(f"/accounts/* returned {len(payload)}/{len(pending)} outputs without a revert")
+        outputs.extend(payload)
+        pending = pending[len(payload) :]
+    return outputs
+
+
+def clause_data(output: dict) -> str:
+    if output.get("reverted"):
+        raise RuntimeError(f"call reverted: {output.get('vmError') or 'unknown error'}")
+    data = output.get("data")
+    if not isinstance(data, str) or not data.startswith("0x") or data == "0x":
+        raise RuntimeError("call returned empty data")
+    return data
 
 
-def fetch_str(api_base: str, contract_address: str, signature: str, *, max_retries: int, backoff_sec: float) -> str:
-    payload = fetch_json(build_call_url(api_base, contract_address, signature), max_retries=max_retries, backoff_sec=backoff_sec)
-    if isinstance(payload, str):
-        return payload
-    raise RuntimeError(f"unexpected string payload for {signature}: {payload!r}")
+def fetch_best_block_id(pool: HttpPool, thor_url: str, *, max_retries: int, backoff_sec: float) -> str:
+    payload = fetch_json(pool, f"{thor_url.rstrip('/')}/blocks/best", max_retries, backoff_sec)
+    block_id = payload.get("id") if isinstance(payload, dict) else None
+    if not isinstance(block_id, str) or not block_id.startswith("0x"):
+        raise RuntimeError(f"unexpected /blocks/best payload: {payload!r}")
+    return block_id
 
 
-def fetch_obj(api_base: str, contract_address: str, signature: str, *, max_retries: int, backoff_sec: float) -> dict:
-    payload = fetch_json(build_call_url(api_base, contract_address, signature), max_retries=max_retries, backoff_sec=backoff_sec)
-    if isinstance(payload, dict):
-        return payload
-    raise RuntimeError(f"unexpected object payload for {signature}: {payload!r}")
+def fetch_total_supply(
+    pool: HttpPool, thor_url: str, contract_address: str, *, revision: str, max_retries: int, backoff_sec: float
+) -> int:
+    clause = {"to": contract_address.lower(), "value": "0x0", "data": SELECTOR_TOTAL_SUPPLY}
+    (output,) = inspect_clauses(
+        pool, thor_url, [clause], revision=revision, max_retries=max_retries, backoff_sec=backoff_sec
+    )
+    return abi_uint(clause_data(output), 0)
 
 
-def run_psql_upsert(database_url: str, csv_path: str) -> None:
-    sql = f"""
+STAGING_TABLE_SQL = """
 create temp table _bb_vechain_node_holder_import (
   snapshot_date date not null,
   token_id bigint not null,
@@ -81,9 +392,33 @@ create temp table _bb_vechain_node_holder_import (
   source text not null,
   contract_address text not null,
   synced_at timestamptz not null
-);
+) on commit delete rows
+"""
+
+COPY_SQL = """
+copy {table} (
+  snapshot_date,
+  token_id,
+  owner_address,
+  node_level,
+  is_x,
+  source,
+  contract_address,
+  synced_at
+) from stdin with (format binary)
+"""
+
+STAGING_TABLE = "_bb_vechain_node_holder_import"
+TARGET_TABLE = "public.vechain_node_holder_daily"
 
-\\copy _bb_vechain_node_holder_import (
+SNAPSHOT_EXISTS_SQL = """
+select 1 from public.vechain_node_holder_daily
+where snapshot_date = %s and contract_address = any(%s)
+limit 1
+"""
+
+UPSERT_SQL = """
+insert into public.vechain_node_holder_daily (
   snapshot_date,
   token_id,
   owner_address,
@@ -92,206 +427,482 @@ create temp table _bb_vechain_node_holder_import (
   source,
   contract_address,
   synced_at
-) from '{csv_path}' with (format csv, header true);
-
-with upserted as (
-  insert into public.vechain_node_holder_daily (
-    snapshot_date,
-    token_id,
-    owner_address,
-    node_level,
-    is_x,
-    source,
-    contract_address,
-    synced_at
-  )
-  select
-    snapshot_date,
-    token_id,
-    owner_address,
-    node_level,
-    is_x,
-    source,
-    contract_address,
-    synced_at
-  from _bb_vechain_node_holder_import
-  on conflict (snapshot_date, contract_address, token_id)
-  do update set
-    owner_address = excluded.owner_address,
-    node_level = excluded.node_level,
-    is_x = excluded.is_x,
-    source = excluded.source,
-    contract_address = excluded.contract_address,
-    synced_at = excluded.synced_at,
-    updated_at = now()
-  returning 1
 )
-select count(*) as upserted_rows from upserted;
+select
+  snapshot_date,
+  token_id,
+  owner_address,
+  node_level,
+  is_x,
+  source,
+  contract_address,
+  synced_at
+from _bb_vechain_node_holder_import
+on conflict (snapshot_date, contract_address, token_id)
+do update set
+  owner_address = excluded.owner_address,
+  node_level = excluded.node_level,
+  is_x = excluded.is_x,
+  source = excluded.source,
+  contract_address = excluded.contract_address,
+  synced_at = excluded.synced_at,
+  updated_at = now()
 """
 
-    proc = subprocess.run(
-        ["psql", "-X", database_url, "-v", "ON_ERROR_STOP=1", "-Atqc", sql],
-        text=True,
-        capture_output=True,
-        check=False,
-    )
-    if proc.returncode != 0:
-        raise RuntimeError(f"psql upsert failed: {proc.stderr.strip()}")
 
-    print(f"[db] upserted rows: {proc.stdout.strip()}")
+def open_import(
+    database_url: str, snapshot_date: str, contract_addresses: list[str]
+) -> tuple[psycopg.Connection, str]:
+    """Connect and pick the table to COPY into; the returned connection's transaction stays open.
+
+    A snapshot that has no rows yet for these contracts is COPYed straight into the
+    target table. Otherwise rows go to a temp staging table and are upserted.
+    """
+    # Imported lazily so --dry-run keeps working without the driver installed.
+    import psycopg
+
+    try:
+        conn = psycopg.connect(database_url, autocommit=False)
+    except psycopg.Error as exc:
+        raise RuntimeError(f"db connect failed: {exc}") from exc
+
+    try:
+        with conn.cursor() as cur:
+            cur.execute(SNAPSHOT_EXISTS_SQL, (snapshot_date, contract_addresses))
+            if cur.fetchone() is None:
+                return conn, TARGET_TABLE
+        conn.execute(STAGING_TABLE_SQL)
+    except psycopg.Error as exc:
+        conn.close()
+        raise RuntimeError(f"db import setup failed: {exc}") from exc
+    except BaseException:
+        conn.close()
+        raise
+    return conn, STAGING_TABLE
+
+
+def snapshot_row_stats(
+    conn: psycopg.Connection, snapshot_date: str, contract_addresses: list[str]
+) -> tuple[int, int, dict[int, int]]:
+    """Return the row count, distinct owner count and level distribution of the committed snapshot."""
+    import psycopg
+
+    where = "where snapshot_date = %s and contract_address = any(%s)"
+    params = (snapshot_date, contract_addresses)
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"select count(*), count(distinct owner_address) from {TARGET_TABLE} {where}", params)
+            snapshot_rows, distinct_owners = cur.fetchone()
+            cur.execute(
+                f"select node_level, count(*) from {TARGET_TABLE} {where} group by node_level order by node_level",
+                params,
+            )
+            level_dist = dict(cur.fetchall())
+    except psycopg.Error as exc:
+        raise RuntimeError(f"db snapshot stats failed: {exc}") from exc
+    return snapshot_rows, distinct_owners, level_dist
+
+
+def commit_import(conn: psycopg.Connection, table: str, rows_written: int) -> None:
+    import psycopg
+
+    # Same transaction as the COPY: both commit (or roll back) together.
+    try:
+        if table == STAGING_TABLE:
+            with conn.cursor() as cur:
+                cur.execute(UPSERT_SQL)
+                upserted_rows = cur.rowcount
+            conn.commit()
+            log(f"[db] upserted rows: {upserted_rows}")
+        else:
+            conn.commit()
+            log(f"[db] copied rows: {rows_written}")
+    except psycopg.Error as exc:
+        raise RuntimeError(f"db commit failed: {exc}") from exc
+
+
+class Checkpoint:
+    """Scan progress of one snapshot, persisted to a JSON state file.
+
+    Per contract it tracks the first token id (legacy) or index (stargate) not yet
+    covered by a contiguous run of complete, committed batches. A rerun for the same
+    snapshot date resumes each scan from there instead of from the beginning, reading
+    at the same block ``revision`` as the interrupted run.
+    """
+
+    def __init__(self, path: str, snapshot_date: str) -> None:
+        self.path = path
+        self.snapshot_date = snapshot_date
+        self.revision = ""
+        self._resume: dict[str, int] = {}
+        self._next: dict[str, int] = {}
+        self._pending: dict[str, dict[int, int]] = {}
+        try:
+            with open(path, encoding="utf-8") as fp:
+                state = json.load(fp)
+            if state.get("snapshot_date") != snapshot_date:
+                return
+            revision = state.get("revision", "")
+            if not isinstance(revision, str):
+                raise TypeError(f"revision must be a string, got {revision!r}")
+            resume = {contract: int(position) for contract, position in state.get("resume_from", {}).items()}
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError, TypeError, AttributeError) as exc:
+            log(f"[sync] ignoring unreadable checkpoint {path}: {exc}")
+            return
+        self.revision = revision
+        self._resume = resume
+
+    def start(self, contract_address: str, first: int) -> int:
+        """Return where the scan of ``contract_address`` should begin (``first`` without a checkpoint)."""
+        position = max(first, self._resume.get(contract_address, first))
+        self._next[contract_address] = position
+        self._pending[contract_address] = {}
+        return position
+
+    def mark(self, rows: RowBuffer) -> None:
+        """Record a written batch; only complete batches can advance the resume point."""
+        if not rows.complete or rows.contract_address not in self._next:
+            return
+        pending = self._pending[rows.contract_address]
+        pending[rows.span.start] = rows.span.stop
+        position = self._next[rows.contract_address]
+        while position in pending:
+            position = pending.pop(position)
+        self._next[rows.contract_address] = position
+
+    def save(self) -> None:
+        # Write-then-rename so a crash never leaves a truncated state file behind.
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as fp:
+            json.dump(
+                {"snapshot_date": self.snapshot_date, "revision": self.revision, "resume_from": self._next}, fp
+            )
+        os.replace(tmp_path, self.path)
+
+    def clear(self) -> None:
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class RowWriter:
+    """Consumes scanned row batches on a background thread.
+
+    Scan threads ``put`` each batch as soon as it is decoded. With a connection the
+    batches are COPYed into ``table`` right away, so ingest overlaps the
+    remaining HTTP work and at most ``maxsize`` batches wait in memory, and the
+    summary stats are computed in SQL afterwards. Every ``checkpoint_rows`` rows the
+    COPY is committed and the checkpoint saved; the caller commits the remaining
+    ``pending_rows``. Without a connection (dry run) batches are only tallied here.
+    """
+
+    def __init__(
+        self,
+        snapshot_date: str,
+        synced_at: str,
+        conn: psycopg.Connection | None = None,
+        table: str = STAGING_TABLE,
+        *,
+        checkpoint: Checkpoint | None = None,
+        checkpoint_rows: int = 5000,
+        maxsize: int = 16,
+    ) -> None:
+        self.snapshot = date.fromisoformat(snapshot_date)
+        self.synced = datetime.fromisoformat(synced_at)
+        self.conn = conn
+        self.table = table
+        self.checkpoint = checkpoint
+        self.checkpoint_rows = checkpoint_rows
+        self.rows_written = 0
+        self.pending_rows = 0
+        self.level_counts: Counter[int] = Counter()
+        self.owners: set[str] = set()
+        self._queue: queue.Queue[RowBuffer | None] = queue.Queue(maxsize)
+        self._error: BaseException | None = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="row-writer", daemon=True)
+        self._thread.start()
+
+    def put(self, rows: RowBuffer) -> None:
+        if self._error is not None:
+            raise RuntimeError(f"row writer failed: {self._error}")
+        rows.trim()
+        self._queue.put(rows)
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._thread.join()
+        if self._error is not None:
+            raise RuntimeError(f"db copy failed: {self._error}") from self._error
+
+    def _run(self) -> None:
+        try:
+            if self.conn is None:
+                while (rows := self._get()) is not None:
+                    self.rows_written += len(rows)
+                    self.level_counts.update(rows.levels)
+                    self.owners.update(rows.owners)
+                return
+
+            with self.conn.cursor() as cur:
+                while self._copy_until_checkpoint(cur):
+                    commit_import(self.conn, self.table, self.pending_rows)
+                    self.pending_rows = 0
+                    self.checkpoint.save()
+        except BaseException as exc:  # noqa: BLE001
+            self._error = exc
+            # Keep draining so scan threads never block on a full queue. The COPY can
+            # also fail on exit after the sentinel was taken; there is nothing left then.
+            while not self._closed:
+                self._get()
+
+    def _get(self) -> RowBuffer | None:
+        rows = self._queue.get()
+        if rows is None:
+            self._closed = True
+        return rows
+
+    def _copy_until_checkpoint(self, cur: psycopg.Cursor) -> bool:
+        """COPY queued batches; return True when a checkpoint is due, False once the queue is closed."""
+        snapshot, synced = self.snapshot, self.synced
+        with cur.copy(COPY_SQL.format(table=self.table)) as copy:
+            copy.set_types(["date", "int8", "text", "int4", "bool", "text", "text", "timestamptz"])
+            write_row = copy.write_row
+            while (rows := self._get()) is not None:
+                self.rows_written += len(rows)
+                self.pending_rows += len(rows)
+                # Per-batch constants are bound once so the per-row loop is just the write_row call.
+                source, contract_address = rows.source, rows.contract_address
+                for token_id, owner, level in zip(rows.token_ids, rows.owners, rows.levels):
+                    write_row(
+                        (
+                            snapshot,
+                            token_id,
+                            owner,
+                            level,
+                            bool(X_LEVEL_MASK >> level & 1),
+                            source,
+                            contract_address,
+                            synced,
+                        )
+                    )
+                if self.checkpoint is not None:
+                    self.checkpoint.mark(rows)
+                    if self.pending_rows >= self.checkpoint_rows:
+                        return True
+        return False
+
+
+def run_batches(
+    fn: Callable[[range], object], batches: list[range], max_workers: int
+) -> Iterator[tuple[range, Future]]:
+    """Run ``fn`` over ``batches`` on a thread pool and yield ``(batch, future)`` as each finishes.
+
+    At most ``max_workers`` batches are in flight; the next one is submitted only when
+    one finishes, and a finished future is dropped once the consumer moves on, so
+    results never pile up ahead of a slow consumer. Closing the generator (the consumer
+    raised) cancels the batches not yet started instead of fetching them all.
+    """
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    remaining = iter(batches)
+    in_flight: dict[Future, range] = {}
+    try:
+        for batch in remaining:
+            in_flight[executor.submit(fn, batch)] = batch
+            if len(in_flight) >= max_workers:
+                break
+        while in_flight:
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                batch = in_flight.pop(future)
+                next_batch = next(remaining, None)
+                if next_batch is not None:
+                    in_flight[executor.submit(fn, next_batch)] = next_batch
+                yield batch, future
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
 
 
 def scan_legacy_contract(
-    api_base: str,
+    pool: HttpPool,
+    writer: RowWriter,
+    thor_url: str,
+    revision: str,
     contract_address: str,
-    snapshot_date: str,
-    synced_at: str,
-    delay: float,
+    max_workers: int,
+    batch_size: int,
     max_retries: int,
     backoff_sec: float,
     max_token_id: int,
-) -> tuple[list[SnapshotRow], list[str], int]:
-    total_supply = fetch_uint(
-        api_base,
-        contract_address,
-        "totalSupply() returns (uint256)",
+    start: int = 1,
+) -> tuple[int, list[str], int]:
+    to = contract_address.lower()
+    total_supply = fetch_total_supply(
+        pool,
+        thor_url,
+        to,
+        revision=revision,
         max_retries=max_retries,
         backoff_sec=backoff_sec,
     )
     upper = total_supply if max_token_id <= 0 else min(total_supply, max_token_id)
-    print(f"[legacy] totalSupply={total_supply}, scanning token_id 1..{upper}")
+    log(f"[legacy] totalSupply={total_supply}, scanning token_id {start}..{upper}")
+
+    def fetch_metadata_batch(token_ids: range) -> list[dict]:
+        clauses = [
+            {"to": to, "value": "0x0", "data": f"{SELECTOR_GET_METADATA}{token_id:064x}"} for token_id in token_ids
+        ]
+        return inspect_clauses(
+            pool, thor_url, clauses, revision=revision, max_retries=max_retries, backoff_sec=backoff_sec
+        )
 
-    rows: list[SnapshotRow] = []
+    source = f"{pool.host}/legacy"
+    valid_rows = 0
     failures: list[str] = []
+    batches = [range(lo, min(lo + batch_size, upper + 1)) for lo in range(start, upper + 1, batch_size)]
+    done = start - 1
 
-    for token_id in range(1, upper + 1):
-        if token_id > 1:
-            time.sleep(delay)
+    with closing(run_batches(fetch_metadata_batch, batches, max_workers)) as results:
+        for token_ids, future in results:
+            done += len(token_ids)
+            try:
+                outputs = future.result()
+            except Exception as exc:  # noqa: BLE001
+                failures.extend(f"legacy token_id={token_id} err={exc}" for token_id in token_ids)
+                continue
 
-        sig = (
-            f"getMetadata(uint256 {token_id}) returns "
-            "(address owner, uint8 level, bool isOnUpgrade, bool isOnAuction, "
-            "uint256 lastTransferTime, uint64 createdAt, uint64 updatedAt)"
-        )
+            rows = RowBuffer(source, to, len(token_ids), span=token_ids)
+            for token_id, output in zip(token_ids, outputs):
+                # getMetadata(uint256) returns (address owner, uint8 level, bool isOnUpgrade,
+                # bool isOnAuction, uint256 lastTransferTime, uint64 createdAt, uint64 updatedAt);
+                # only the first two words are decoded.
+                try:
+                    data = clause_data(output)
+                    owner = abi_address(data, 0)
+                    level = abi_uint(data, 1)
+                except Exception as exc:  # noqa: BLE001
+                    failures.append(f"legacy token_id={token_id} err={exc}")
+                    rows.complete = False
+                    continue
 
-        try:
-            meta = fetch_obj(api_base, contract_address, sig, max_retries=max_retries, backoff_sec=backoff_sec)
-        except Exception as exc:  # noqa: BLE001
-            failures.append(f"legacy token_id={token_id} err={exc}")
-            continue
+                if owner == ZERO_ADDRESS or level <= 0:
+                    continue
 
-        owner = str(meta.get("owner", "")).lower()
-        try:
-            level = int(meta.get("level", "0"))
-        except Exception:  # noqa: BLE001
-            level = 0
-
-        if not owner or owner == ZERO_ADDRESS or level <= 0:
-            continue
-
-        rows.append(
-            SnapshotRow(
-                snapshot_date=snapshot_date,
-                token_id=token_id,
-                owner_address=owner,
-                node_level=level,
-                is_x=level in X_LEVELS,
-                source="call.api.vechain.energy/legacy",
-                contract_address=contract_address.lower(),
-                synced_at=synced_at,
-            )
-        )
+                rows.append(token_id, owner, level)
 
-        if token_id % 500 == 0:
-            print(f"[legacy] progress token_id={token_id}/{upper}, valid_rows={len(rows)}")
+            writer.put(rows)
+            valid_rows += len(rows)
+            log(f"[legacy] progress done={done}/{upper}, valid_rows={valid_rows}")
 
-    return rows, failures, total_supply
+    return valid_rows, failures, total_supply
 
 
 def scan_stargate_contract(
-    api_base: str,
+    pool: HttpPool,
+    writer: RowWriter,
+    thor_url: str,
+    revision: str,
     contract_address: str,
-    snapshot_date: str,
-    synced_at: str,
-    delay: float,
+    max_workers: int,
+    batch_size: int,
     max_retries: int,
     backoff_sec: float,
     max_items: int,
-) -> tuple[list[SnapshotRow], list[str], int]:
-    total_supply = fetch_uint(
-        api_base,
-        contract_address,
-        "totalSupply() returns (uint256)",
+    start: int = 0,
+) -> tuple[int, list[str], int]:
+    to = contract_address.lower()
+    total_supply = fetch_total_supply(
+        pool,
+        thor_url,
+        to,
+        revision=revision,
         max_retries=max_retries,
         backoff_sec=backoff_sec,
     )
     upper_items = total_supply if max_items <= 0 else min(total_supply, max_items)
-    print(f"[stargate] totalSupply={total_supply}, scanning index 0..{upper_items - 1}")
+    log(f"[stargate] totalSupply={total_supply}, scanning index {start}..{upper_items - 1}")
 
-    rows: list[SnapshotRow] = []
-    failures: list[str] = []
+    def fetch_token_batch(indexes: range) -> tuple[list[tuple[int, int]], list[str], list[dict]]:
+        """Resolve token ids for ``indexes``, then batch ownerOf + getToken for those ids.
 
-    for idx in range(0, upper_items):
-        if idx > 0:
-            time.sleep(delay)
+        Returns the resolved ``(index, token_id)`` pairs, failures for indexes whose id
+        lookup failed, and the interleaved ownerOf/getToken outputs for the resolved ids.
+        """
+        id_clauses = [{"to": to, "value": "0x0", "data": f"{SELECTOR_TOKEN_BY_INDEX}{idx:064x}"} for idx in indexes]
+        id_outputs = inspect_clauses(
+            pool, thor_url, id_clauses, revision=revision, max_retries=max_retries, backoff_sec=backoff_sec
+        )
 
-        try:
-            token_id = fetch_uint(
-                api_base,
-                contract_address,
-                f"tokenByIndex(uint256 {idx}) returns (uint256)",
-                max_retries=max_retries,
-                backoff_sec=backoff_sec,
-            )
-            owner = fetch_str(
-                api_base,
-                contract_address,
-                f"ownerOf(uint256 {token_id}) returns (address)",
-                max_retries=max_retries,
-                backoff_sec=backoff_sec,
-            ).lower()
-            token_obj = fetch_obj(
-                api_base,
-                contract_address,
-                f"getToken(uint256 {token_id}) returns (uint256 tokenId, uint8 levelId, uint64 mintedAtBlock, uint248 vetAmountStaked, uint64 deprecated_lastVthoClaimedAt)",
-                max_retries=max_retries,
-                backoff_sec=backoff_sec,
-            )
-        except Exception as exc:  # noqa: BLE001
-            failures.append(f"stargate index={idx} err={exc}")
-            continue
+        resolved: list[tuple[int, int]] = []
+        batch_failures: list[str] = []
+        for idx, output in zip(indexes, id_outputs):
+            try:
+                resolved.append((idx, abi_uint(clause_data(output), 0)))
+            except Exception as exc:  # noqa: BLE001
+                batch_failures.append(f"stargate index={idx} err={exc}")
 
-        try:
-            level = int(token_obj.get("levelId", token_obj.get("1", "0")))
-        except Exception:  # noqa: BLE001
-            level = 0
-
-        if not owner or owner == ZERO_ADDRESS or level <= 0:
-            continue
-
-        rows.append(
-            SnapshotRow(
-                snapshot_date=snapshot_date,
-                token_id=token_id,
-                owner_address=owner,
-                node_level=level,
-                is_x=level in X_LEVELS,
-                source="call.api.vechain.energy/stargate",
-                contract_address=contract_address.lower(),
-                synced_at=synced_at,
-            )
+        detail_clauses = [
+            {"to": to, "value": "0x0", "data": f"{selector}{token_id:064x}"}
+            for _, token_id in resolved
+            for selector in (SELECTOR_OWNER_OF, SELECTOR_GET_TOKEN)
+        ]
+        if not detail_clauses:
+            return resolved, batch_failures, []
+        detail_outputs = inspect_clauses(
+            pool, thor_url, detail_clauses, revision=revision, max_retries=max_retries, backoff_sec=backoff_sec
         )
+        return resolved, batch_failures, detail_outputs
+
+    source = f"{pool.host}/stargate"
+    valid_rows = 0
+    failures: list[str] = []
+    batches = [range(lo, min(lo + batch_size, upper_items)) for lo in range(start, upper_items, batch_size)]
+    done = start
+
+    with closing(run_batches(fetch_token_batch, batches, max_workers)) as results:
+        for indexes, future in results:
+            done += len(indexes)
+            try:
+                resolved, batch_failures, detail_outputs = future.result()
+            except Exception as exc:  # noqa: BLE001
+                failures.extend(f"stargate index={idx} err={exc}" for idx in indexes)
+                continue
+
+            failures.extend(batch_failures)
+            rows = RowBuffer(source, to, len(resolved), span=indexes)
+            rows.complete = not batch_failures
+            for (idx, token_id), owner_output, token_output in zip(
+                resolved, detail_outputs[0::2], detail_outputs[1::2]
+            ):
+                # ownerOf(uint256) returns (address); getToken(uint256) returns (uint256 tokenId,
+                # uint8 levelId, uint64 mintedAtBlock, uint248 vetAmountStaked, uint64 lastVthoClaimedAt)
+                try:
+                    owner = abi_address(clause_data(owner_output), 0)
+                    level = abi_uint(clause_data(token_output), 1)
+                except Exception as exc:  # noqa: BLE001
+                    failures.append(f"stargate index={idx} err={exc}")
+                    rows.complete = False
+                    continue
+
+                if owner == ZERO_ADDRESS or level <= 0:
+                    continue
+
+                rows.append(token_id, owner, level)
 
-        if idx % 1000 == 0 and idx > 0:
-            print(f"[stargate] progress index={idx}/{upper_items - 1}, valid_rows={len(rows)}")
+            writer.put(rows)
+            valid_rows += len(rows)
+            log(f"[stargate] progress done={done}/{upper_items}, valid_rows={valid_rows}")
 
-    return rows, failures, total_supply
+    return valid_rows, failures, total_supply
 
 
 def main() -> int:
     parser = argparse.ArgumentParser(description="Sync VeChain node holders daily snapshot (full-network)")
     parser.add_argument("--database-url", default=os.getenv("DATABASE_URL", ""))
-    parser.add_argument("--api-base", default=os.getenv("VECHAIN_NODE_CALL_API_BASE", "https://call.api.vechain.energy/main"))
+    parser.add_argument("--thor-url", default=os.getenv("VECHAIN_THOR_URL", "https://mainnet.vechain.org"))
     parser.add_argument(
         "--legacy-contract-address",
         default=os.getenv("VECHAIN_NODE_LEGACY_CONTRACT_ADDRESS", "0xb81e9c5f9644dec9e5e3cac86b4461a222072302"),
@@ -304,114 +915,166 @@ def main() -> int:
         "--snapshot-date",
         default=os.getenv("SNAPSHOT_DATE", datetime.now(timezone.utc).date().isoformat()),
     )
-    parser.add_argument("--rps", type=float, default=float(os.getenv("VECHAIN_NODE_SYNC_RPS", "3")))
+    parser.add_argument(
+        "--max-concurrency", type=int, default=int(os.getenv("VECHAIN_NODE_SYNC_MAX_CONCURRENCY", "64"))
+    )
+    parser.add_argument("--target-latency-ms", type=float, default=2000.0)
+    parser.add_argument(
+        "--batch-size", type=int, default=int(os.getenv("VECHAIN_NODE_SYNC_BATCH_SIZE", "500"))
+    )
     parser.add_argument("--max-retries", type=int, default=int(os.getenv("VECHAIN_NODE_MAX_RETRIES", "5")))
     parser.add_argument("--backoff-sec", type=float, default=0.5)
     parser.add_argument("--max-legacy-token-id", type=int, default=0)
     parser.add_argument("--max-stargate-items", type=int, default=0)
+    parser.add_argument(
+        "--state-file", default=os.getenv("VECHAIN_NODE_SYNC_STATE_FILE", ".sync_state.json")
+    )
+    parser.add_argument("--checkpoint-rows", type=int, default=5000)
     parser.add_argument("--dry-run", action="store_true")
 
     args = parser.parse_args()
 
-    if args.rps <= 0:
-        raise ValueError("--rps must be > 0")
+    if args.max_concurrency <= 0:
+        raise ValueError("--max-concurrency must be > 0")
+    if args.batch_size <= 0:
+        raise ValueError("--batch-size must be > 0")
+    if args.target_latency_ms <= 0:
+        raise ValueError("--target-latency-ms must be > 0")
+    if args.checkpoint_rows <= 0:
+        raise ValueError("--checkpoint-rows must be > 0")
+
+    if not args.dry_run and not args.database_url:
+        raise RuntimeError("DATABASE_URL is required for non-dry-run mode")
 
-    delay = 1.0 / args.rps
     synced_at = datetime.now(timezone.utc).isoformat()
 
-    legacy_rows, legacy_failures, legacy_supply = scan_legacy_contract(
-        api_base=args.api_base,
-        contract_address=args.legacy_contract_address,
-        snapshot_date=args.snapshot_date,
-        synced_at=synced_at,
-        delay=delay,
-        max_retries=args.max_retries,
-        backoff_sec=args.backoff_sec,
-        max_token_id=args.max_legacy_token_id,
+    controller = AimdController(
+        start=min(8, args.max_concurrency),
+        maximum=args.max_concurrency,
+        target_latency=args.target_latency_ms / 1000.0,
     )
+    pool = HttpPool(args.thor_url, controller, maxsize=args.max_concurrency)
+    contract_addresses = [args.legacy_contract_address.lower(), args.stargate_nft_contract_address.lower()]
+    legacy_contract, stargate_contract = contract_addresses
+    # Dry runs commit nothing, so they neither resume from nor write a checkpoint.
+    checkpoint = None if args.dry_run else Checkpoint(args.state_file, args.snapshot_date)
+    legacy_start = checkpoint.start(legacy_contract, 1) if checkpoint else 1
+    stargate_start = checkpoint.start(stargate_contract, 0) if checkpoint else 0
+    resuming = legacy_start > 1 or stargate_start > 0
+    if resuming:
+        log(f"[sync] resuming from {args.state_file}: legacy token_id={legacy_start}, stargate index={stargate_start}")
 
-    stargate_rows, stargate_failures, stargate_supply = scan_stargate_contract(
-        api_base=args.api_base,
-        contract_address=args.stargate_nft_contract_address,
-        snapshot_date=args.snapshot_date,
-        synced_at=synced_at,
-        delay=delay,
-        max_retries=args.max_retries,
-        backoff_sec=args.backoff_sec,
-        max_items=args.max_stargate_items,
-    )
+    # Every call reads the same block, so the snapshot is one point in time even though it
+    # spans many requests (and, when resuming, more than one run).
+    revision = checkpoint.revision if checkpoint is not None else ""
+    if not revision:
+        revision = fetch_best_block_id(
+            pool, args.thor_url, max_retries=args.max_retries, backoff_sec=args.backoff_sec
+        )
+    if checkpoint is not None:
+        checkpoint.revision = revision
+    log(f"[sync] reading contract state at block {revision}")
 
-    rows = legacy_rows + stargate_rows
-    failures = legacy_failures + stargate_failures
-
-    level_dist = Counter(r.node_level for r in rows)
-    owner_dist = Counter(r.owner_address for r in rows)
-
-    print(
-        json.dumps(
-            {
-                "snapshot_date": args.snapshot_date,
-                "legacy_total_supply": legacy_supply,
-                "stargate_total_supply": stargate_supply,
-                "valid_rows": len(rows),
-                "distinct_owners": len(owner_dist),
-                "legacy_rows": len(legacy_rows),
-                "stargate_rows": len(stargate_rows),
-                "level_distribution": dict(sorted(level_dist.items())),
-                "failures": len(failures),
-                "sample_failures": failures[:5],
-            },
-            ensure_ascii=False,
-            indent=2,
+    conn, table = None, STAGING_TABLE
+    if not args.dry_run:
+        conn, table = open_import(args.database_url, args.snapshot_date, contract_addresses)
+    try:
+        writer = RowWriter(
+            args.snapshot_date,
+            synced_at,
+            conn,
+            table,
+            checkpoint=checkpoint,
+            checkpoint_rows=args.checkpoint_rows,
         )
-    )
+        try:
+            # The two contracts are independent, so both scans share the pool and run side by side.
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                legacy_future = executor.submit(
+                    scan_legacy_contract,
+                    pool=pool,
+                    writer=writer,
+                    thor_url=args.thor_url,
+                    revision=revision,
+                    contract_address=legacy_contract,
+                    max_workers=args.max_concurrency,
+                    batch_size=args.batch_size,
+                    max_retries=args.max_retries,
+                    backoff_sec=args.backoff_sec,
+                    max_token_id=args.max_legacy_token_id,
+                    start=legacy_start,
+                )
+                stargate_future = executor.submit(
+                    scan_stargate_contract,
+                    pool=pool,
+                    writer=writer,
+                    thor_url=args.thor_url,
+                    revision=revision,
+                    contract_address=stargate_contract,
+                    max_workers=args.max_concurrency,
+                    batch_size=args.batch_size,
+                    max_retries=args.max_retries,
+                    backoff_sec=args.backoff_sec,
+                    max_items=args.max_stargate_items,
+                    start=stargate_start,
+                )
+                legacy_rows, legacy_failures, legacy_supply = legacy_future.result()
+                stargate_rows, stargate_failures, stargate_supply = stargate_future.result()
+        finally:
+            pool.close()
+            writer.close()
 
-    if args.dry_run:
-        print("[sync] dry-run completed (no DB write)")
-        return 0
+        failures = legacy_failures + stargate_failures
+        if conn is None:
+            snapshot_rows, distinct_owners = writer.rows_written, len(writer.owners)
+            level_dist = dict(writer.level_counts)
+        else:
+            # A resumed run may legitimately find nothing left to write; it still has to
+            # clear or refresh the checkpoint below, or every rerun would stop here again.
+            if not writer.rows_written and not resuming:
+                raise RuntimeError("no valid holder rows fetched; aborting DB write")
 
-    if not args.database_url:
-        raise RuntimeError("DATABASE_URL is required for non-dry-run mode")
+            commit_import(conn, table, writer.pending_rows)
+            if failures:
+                # Keep it so a rerun retries from the first batch that had a failure.
+                checkpoint.save()
+                log(f"[sync] checkpoint saved to {args.state_file}")
+            else:
+                checkpoint.clear()
+            snapshot_rows, distinct_owners, level_dist = snapshot_row_stats(
+                conn, args.snapshot_date, contract_addresses
+            )
 
-    if not rows:
-        raise RuntimeError("no valid holder rows fetched; aborting DB upsert")
-
-    with tempfile.NamedTemporaryFile(mode="w", suffix=".csv", delete=False, newline="") as fp:
-        writer = csv.writer(fp)
-        writer.writerow(
-            [
-                "snapshot_date",
-                "token_id",
-                "owner_address",
-                "node_level",
-                "is_x",
-                "source",
-                "contract_address",
-                "synced_at",
-            ]
-        )
-        for r in rows:
-            writer.writerow(
-                [
-                    r.snapshot_date,
-                    r.token_id,
-                    r.owner_address,
-                    r.node_level,
-                    str(r.is_x).lower(),
-                    r.source,
-                    r.contract_address,
-                    r.synced_at,
-                ]
+        print(
+            json.dumps(
+                {
+                    "snapshot_date": args.snapshot_date,
+                    "legacy_total_supply": legacy_supply,
+                    "stargate_total_supply": stargate_supply,
+                    # Whole snapshot (committed rows in DB mode, including earlier runs it resumed).
+                    "valid_rows": snapshot_rows,
+                    "distinct_owners": distinct_owners,
+                    "level_distribution": dict(sorted(level_dist.items())),
+                    # This run only; a resumed run fetches just the remaining range.
+                    "resumed": resuming,
+                    "fetched_rows": writer.rows_written,
+                    "legacy_rows": legacy_rows,
+                    "stargate_rows": stargate_rows,
+                    "failures": len(failures),
+                    "sample_failures": failures[:5],
+                },
+                ensure_ascii=False,
+                indent=2,
             )
-        csv_path = fp.name
+        )
 
-    try:
-        run_psql_upsert(args.database_url, csv_path)
+        if conn is None:
+            print("[sync] dry-run completed (no DB write)")
+            return 0
     finally:
-        try:
-            os.unlink(csv_path)
-        except OSError:
-            pass
+        if conn is not None:
+            # Rolls back any COPY that was not committed yet.
+            conn.close()
 
     print("[sync] completed successfully")
     return 0
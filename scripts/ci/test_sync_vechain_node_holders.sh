@@ -0,0 +1,376 @@
+#!/usr/bin/env bash
+set -euo pipefail
+
+# Runs sync_vechain_node_holders.py against a stub Thor server and a throwaway
+# Postgres. A cluster is created with initdb unless TEST_DATABASE_URL points at a
+# disposable database (public.vechain_node_holder_daily is dropped and recreated).
+
+ROOT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")/../.." && pwd)"
+TARGET_SCRIPT="${ROOT_DIR}/scripts/ci/sync_vechain_node_holders.py"
+MIGRATION="${ROOT_DIR}/supabase/migrations/20260225_vechain_node_holder_daily.sql"
+PYTHON="${PYTHON:-python3}"
+SNAPSHOT_DATE="2026-01-01"
+LEGACY_CONTRACT="0xb81e9c5f9644dec9e5e3cac86b4461a222072302"
+STARGATE_CONTRACT="0x1856c533ac2d94340aaa8544d35a5c1d4a21dee7"
+BEST_BLOCK="0x$(printf 'ab%.0s' {1..32})"
+
+for path in "${TARGET_SCRIPT}" "${MIGRATION}"; do
+  if [[ ! -f "${path}" ]]; then
+    echo "missing file: ${path}" >&2
+    exit 1
+  fi
+done
+
+tmp_dir="$(mktemp -d)"
+server_pid=""
+pg_bin=""
+
+cleanup() {
+  if [[ -n "${server_pid}" ]]; then
+    kill "${server_pid}" 2>/dev/null || true
+  fi
+  if [[ -n "${pg_bin}" ]]; then
+    "${pg_bin}/pg_ctl" -D "${tmp_dir}/pgdata" -m immediate stop >/dev/null 2>&1 || true
+  fi
+  rm -rf "${tmp_dir}"
+}
+trap cleanup EXIT
+
+fail() {
+  echo "$1" >&2
+  if [[ $# -gt 1 ]]; then
+    printf '%s\n' "$2" >&2
+  fi
+  exit 1
+}
+
+# --- stub Thor server -------------------------------------------------------
+
+cat >"${tmp_dir}/stub_thor.py" <<'EOF'
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STATE_DIR, BEST_BLOCK, LEGACY, STARGATE = sys.argv[1:5]
+SUPPLY = {LEGACY: 50, STARGATE: 30}
+LOG_LOCK = threading.Lock()
+
+
+def word(*values: int) -> str:
+    return "0x" + "".join(f"{value:064x}" for value in values)
+
+
+def owner(token_id: int) -> int:
+    return 0x1000 + token_id % 7
+
+
+def level(token_id: int) -> int:
+    return token_id % 9  # level 0 rows are skipped by the sync
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args: object) -> None:
+        pass
+
+    def reply(self, status: int, payload: object) -> None:
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        if self.path == "/blocks/best":
+            return self.reply(200, {"id": BEST_BLOCK, "number": 1})
+        self.reply(404, {"error": self.path})
+
+    def do_POST(self) -> None:
+        clauses = json.loads(self.rfile.read(int(self.headers["content-length"])))["clauses"]
+        if self.path != f"/accounts/*?revision={BEST_BLOCK}":
+            return self.reply(400, {"error": f"unpinned call {self.path}"})
+        with LOG_LOCK, open(os.path.join(STATE_DIR, "requests.log"), "a") as fp:
+            fp.write(clauses[0]["data"][:74] + "\n")
+        with open(os.path.join(STATE_DIR, "revert_token")) as fp:
+            revert_token = int(fp.read().strip() or 0)
+
+        outputs = []
+        for clause in clauses:
+            selector, arg = clause["data"][:10], int(clause["data"][10:74] or "0", 16)
+            if selector == "0x18160ddd":  # totalSupply()
+                supply_path = os.path.join(STATE_DIR, "legacy_supply")
+                if clause["to"] == LEGACY and os.path.exists(supply_path):
+                    with open(supply_path) as fp:
+                        data = word(int(fp.read()))
+                else:
+                    data = word(SUPPLY[clause["to"]])
+            elif selector == "0xa574cea4":  # getMetadata(uint256)
+                if arg == revert_token:
+                    # Thor stops executing at the first reverted clause.
+                    outputs.append({"data": "0x", "reverted": True, "vmError": "execution reverted"})
+                    break
+                data = word(owner(arg), level(arg), 0, 0, 0, 0, 0)
+            elif selector == "0x4f6ccce7":  # tokenByIndex(uint256)
+                data = word(arg * 3 + 1)
+            elif selector == "0x6352211e":  # ownerOf(uint256)
+                data = word(owner(arg))
+            elif selector == "0xe4b50cb8":  # getToken(uint256)
+                data = word(arg, level(arg), 0, 0, 0)
+            else:
+                return self.reply(400, {"error": f"unknown selector {selector}"})
+            outputs.append({"data": data, "reverted": False, "vmError": ""})
+        self.reply(200, outputs)
+
+
+server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+with open(os.path.join(STATE_DIR, "port"), "w") as fp:
+    fp.write(str(server.server_port))
+server.serve_forever()
+EOF
+
+: >"${tmp_dir}/revert_token"
+"${PYTHON}" "${tmp_dir}/stub_thor.py" "${tmp_dir}" "${BEST_BLOCK}" "${LEGACY_CONTRACT}" "${STARGATE_CONTRACT}" &
+server_pid=$!
+for _ in $(seq 1 50); do
+  [[ -s "${tmp_dir}/port" ]] && break
+  sleep 0.1
+done
+[[ -s "${tmp_dir}/port" ]] || fail "stub Thor server did not start"
+THOR_URL="http://127.0.0.1:$(cat "${tmp_dir}/port")"
+
+# --- throwaway Postgres -----------------------------------------------------
+
+find_pg_bin() {
+  if command -v initdb >/dev/null 2>&1; then
+    dirname "$(command -v initdb)"
+    return
+  fi
+  ls -d /usr/lib/postgresql/*/bin 2>/dev/null | sort -V | tail -n 1 || true
+}
+
+if [[ -n "${TEST_DATABASE_URL:-}" ]]; then
+  DB_URL="${TEST_DATABASE_URL}"
+else
+  pg_bin="$(find_pg_bin)"
+  [[ -n "${pg_bin}" && -x "${pg_bin}/initdb" ]] || fail "initdb not found; install PostgreSQL or set TEST_DATABASE_URL"
+  "${pg_bin}/initdb" -D "${tmp_dir}/pgdata" -U postgres -A trust >/dev/null
+  "${pg_bin}/pg_ctl" -D "${tmp_dir}/pgdata" -l "${tmp_dir}/pg.log" -w \
+    -o "-k ${tmp_dir} -c listen_addresses=''" start >/dev/null
+  DB_URL="postgresql://postgres@/postgres?host=${tmp_dir}"
+fi
+
+sql() {
+  "${PYTHON}" - "${DB_URL}" "$1" <<'EOF'
+import sys
+
+import psycopg
+
+with psycopg.connect(sys.argv[1], autocommit=True) as conn:
+    cur = conn.execute(sys.argv[2])
+    if cur.description:
+        print("|".join(str(value) for value in cur.fetchone()))
+EOF
+}
+
+reset_schema() {
+  sql "
+    drop table if exists public.vechain_node_holder_daily cascade;
+    create or replace function public.set_updated_at()
+    returns trigger as \$\$
+    begin
+      new.updated_at = now();
+      return new;
+    end;
+    \$\$ language plpgsql;
+    $(cat "${MIGRATION}")
+  " >/dev/null
+  rm -f "${tmp_dir}/state.json"
+}
+
+run_sync() {
+  # Fails the test on a hang instead of blocking CI; exit 124 means timeout.
+  timeout 60 "${PYTHON}" "${TARGET_SCRIPT}" \
+    --thor-url "${THOR_URL}" \
+    --snapshot-date "${SNAPSHOT_DATE}" \
+    --batch-size 7 \
+    --max-concurrency 4 \
+    --max-retries 2 \
+    --backoff-sec 0.01 \
+    --state-file "${tmp_dir}/state.json" \
+    "$@" 2>&1
+}
+
+expect_status() {
+  local name="$1" expected="$2" actual="$3" output="$4"
+  if [[ "${actual}" != "${expected}" ]]; then
+    fail "${name}: expected exit ${expected}, got ${actual}" "${output}"
+  fi
+}
+
+expect_output() {
+  local name="$1" needle="$2" output="$3"
+  grep -F -- "${needle}" <<<"${output}" >/dev/null || fail "${name}: missing '${needle}'" "${output}"
+}
+
+metadata_clause() {
+  printf '0xa574cea4%064x' "$1"
+}
+
+# --- cases -----------------------------------------------------------------
+
+case_revert_resend() {
+  local name="revert-resend" output status
+  echo 13 >"${tmp_dir}/revert_token"
+  : >"${tmp_dir}/requests.log"
+
+  set +e
+  output="$(run_sync --dry-run)"
+  status=$?
+  set -e
+
+  expect_status "${name}" 0 "${status}" "${output}"
+  expect_output "${name}" '"failures": 1,' "${output}"
+  expect_output "${name}" "legacy token_id=13 err=call reverted" "${output}"
+  # 50 legacy tokens minus 5 level-0 ids minus the reverted one; stargate has no level-0 ids.
+  expect_output "${name}" '"legacy_rows": 44,' "${output}"
+  expect_output "${name}" '"stargate_rows": 30,' "${output}"
+  # Batch 8..14 reverts at 13, so 14 must be re-sent as the head of a follow-up request.
+  grep -Fx "$(metadata_clause 14)" "${tmp_dir}/requests.log" >/dev/null \
+    || fail "${name}: clause after the revert was not re-sent" "$(cat "${tmp_dir}/requests.log")"
+}
+
+case_checkpoint_mark() {
+  local name="checkpoint-mark" output status
+  set +e
+  output="$(
+    "${PYTHON}" - "${TARGET_SCRIPT}" "${tmp_dir}/unit_state.json" <<'EOF' 2>&1
+import importlib.util
+import json
+import sys
+
+script, path = sys.argv[1:3]
+spec = importlib.util.spec_from_file_location("sync_vechain_node_holders", script)
+sync = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(sync)
+
+contract = "0xb81e9c5f9644dec9e5e3cac86b4461a222072302"
+
+
+def batch(lo, hi, complete=True):
+    rows = sync.RowBuffer("stub/legacy", contract, span=range(lo, hi))
+    rows.complete = complete
+    return rows
+
+
+def saved(checkpoint):
+    checkpoint.save()
+    with open(path, encoding="utf-8") as fp:
+        return json.load(fp)["resume_from"][contract]
+
+
+checkpoint = sync.Checkpoint(path, "2026-01-01")
+checkpoint.revision = "0xblock"
+assert checkpoint.start(contract, 1) == 1
+checkpoint.mark(batch(8, 15))
+assert saved(checkpoint) == 1, "an out-of-order batch must not advance past a gap"
+checkpoint.mark(batch(1, 8))
+assert saved(checkpoint) == 15, "filling the gap advances over both batches"
+checkpoint.mark(batch(22, 29))
+checkpoint.mark(batch(15, 22, complete=False))
+assert saved(checkpoint) == 15, "an incomplete batch blocks the resume point"
+
+resumed = sync.Checkpoint(path, "2026-01-01")
+assert resumed.start(contract, 1) == 15 and resumed.revision == "0xblock"
+assert sync.Checkpoint(path, "2026-01-02").start(contract, 1) == 1, "other dates start over"
+
+for bad in ("[]", "null", '{"snapshot_date": "2026-01-01", "resume_from": {"%s": null}}' % contract):
+    with open(path, "w", encoding="utf-8") as fp:
+        fp.write(bad)
+    assert sync.Checkpoint(path, "2026-01-01").start(contract, 1) == 1, bad
+
+checkpoint.clear()
+checkpoint.clear()
+print("ok")
+EOF
+  )"
+  status=$?
+  set -e
+
+  expect_status "${name}" 0 "${status}" "${output}"
+}
+
+case_resume() {
+  local name="resume" output status min_token
+  reset_schema
+  echo 13 >"${tmp_dir}/revert_token"
+
+  set +e
+  output="$(run_sync --database-url "${DB_URL}")"
+  status=$?
+  set -e
+  expect_status "${name}" 0 "${status}" "${output}"
+  expect_output "${name}" "[db] copied rows: 74" "${output}"
+  [[ "$(sql "select count(*) from public.vechain_node_holder_daily")" == "74" ]] \
+    || fail "${name}: expected 74 committed rows after the first run"
+  expect_output "${name}" "\"${LEGACY_CONTRACT}\": 8" "$(cat "${tmp_dir}/state.json")"
+  expect_output "${name}" "\"${STARGATE_CONTRACT}\": 30" "$(cat "${tmp_dir}/state.json")"
+  expect_output "${name}" "\"revision\": \"${BEST_BLOCK}\"" "$(cat "${tmp_dir}/state.json")"
+
+  : >"${tmp_dir}/revert_token"
+  : >"${tmp_dir}/requests.log"
+  set +e
+  output="$(run_sync --database-url "${DB_URL}")"
+  status=$?
+  set -e
+  expect_status "${name}" 0 "${status}" "${output}"
+  expect_output "${name}" "legacy token_id=8, stargate index=30" "${output}"
+  expect_output "${name}" '"resumed": true,' "${output}"
+  expect_output "${name}" '"valid_rows": 75,' "${output}"
+  expect_output "${name}" '"fetched_rows": 38,' "${output}"
+  min_token="$(grep '^0xa574cea4' "${tmp_dir}/requests.log" | cut -c11- | sort | head -n 1)"
+  [[ "${min_token}" == "$(printf '%064x' 8)" ]] || fail "${name}: resumed scan did not start at token 8"
+  [[ ! -e "${tmp_dir}/state.json" ]] || fail "${name}: checkpoint not cleared after a clean run"
+  [[ "$(sql "select count(*) from public.vechain_node_holder_daily")" == "75" ]] \
+    || fail "${name}: expected 75 committed rows after the resumed run"
+}
+
+case_copy_failure() {
+  local name="copy-failure" checkpoint_rows output status requests
+  : >"${tmp_dir}/revert_token"
+  # 2002 legacy tokens are 286 batches of 7.
+  echo 2002 >"${tmp_dir}/legacy_supply"
+  # 5000 keeps the whole run in the final COPY segment; 10 fails an intermediate one.
+  for checkpoint_rows in 5000 10; do
+    reset_schema
+    sql "alter table public.vechain_node_holder_daily add constraint reject_token_30 check (token_id <> 30)"
+    : >"${tmp_dir}/requests.log"
+
+    set +e
+    output="$(run_sync --database-url "${DB_URL}" --checkpoint-rows "${checkpoint_rows}")"
+    status=$?
+    set -e
+
+    expect_status "${name}/${checkpoint_rows}" 1 "${status}" "${output}"
+    expect_output "${name}/${checkpoint_rows}" "db copy failed" "${output}"
+    expect_output "${name}/${checkpoint_rows}" "reject_token_30" "${output}"
+  done
+
+  # The intermediate failure stops the scan: batches not yet started are cancelled
+  # instead of being fetched from the node.
+  requests="$(grep -c '^0xa574cea4' "${tmp_dir}/requests.log")"
+  if (( requests >= 100 )); then
+    fail "${name}: ${requests}/286 legacy batches fetched after the COPY failed"
+  fi
+  rm -f "${tmp_dir}/legacy_supply"
+}
+
+case_revert_resend
+case_checkpoint_mark
+case_resume
+case_copy_failure
+
+echo "sync_vechain_node_holders tests passed"